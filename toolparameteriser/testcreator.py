@@ -1,7 +1,7 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
 import csv,json
-import random,os
+import random,os,re,shlex
 import logging,glob,shutil,errno
 from string import Template
 import xml.etree.ElementTree as ET
@@ -56,6 +56,81 @@ class AbstractTester(ABC):
     @abstractmethod
     def _create_jobscript_template(self,**kwargs):
         pass
+
+    def _stages_enabled(self)->bool:
+        jobs=self.Config["jobs"]
+        # an empty "stages" list counts as not set
+        return bool(jobs.get("stages")) or bool(jobs.get("split_stages",False))
+
+    def _get_pipelines(self,steps:list)->list:
+        '''
+        Turns a list of sequential (name, cmd) steps into a list of pipelines,
+        each a list of uniquely named (name, cmd) stages. If "split_stages" is set,
+        steps are split on their top-level pipes.
+        '''
+        pipelines=[]
+        seen=set()
+        for name,cmd in steps:
+            if self.Config["jobs"].get("split_stages",False):
+                parts=toolparameteriser.utils.split_pipeline(cmd)
+            else:
+                parts=[cmd.strip()]
+            pipeline=[]
+            for part in parts:
+                stage_name=self.__get_stage_name(part)
+                if name and len(parts)>1:
+                    stage_name=f"{name}.{stage_name}"
+                elif name:
+                    stage_name=name
+                stage_name=re.sub(r"[^A-Za-z0-9_.-]","_",stage_name)
+                if stage_name in seen:
+                    suffix=2
+                    while f"{stage_name}_{suffix}" in seen:
+                        suffix+=1
+                    stage_name=f"{stage_name}_{suffix}"
+                seen.add(stage_name)
+                pipeline.append((stage_name,part))
+            pipelines.append(pipeline)
+        return pipelines
+
+    def __get_stage_name(self,cmd:str)->str:
+        try:
+            words=shlex.split(cmd)
+        except ValueError:
+            words=cmd.split()
+        # skip leading environment variable assignments e.g., "OMP_NUM_THREADS=4 tool ..."
+        words=[word for word in words if not re.match(r"^[A-Za-z_][A-Za-z0-9_]*=",word)]
+        return os.path.basename(words[0]) if words else "stage"
+
+    def _get_stage_lines(self,pipelines:list)->list:
+        '''
+        Returns job script lines running each stage under GNU time, so that its
+        wall-clock time, CPU time and peak RSS are appended to the stage times file
+        in the job directory. With stage_mode="srun", each stage is also run as its
+        own Slurm job step.
+        '''
+        mode=self.Config["jobs"].get("stage_mode","time").lower()
+        if mode not in ("time","srun"):
+            logging.fatal(f'Unknown stage_mode, {mode}, valid values include [time, srun]')
+            exit()
+        timesfile=toolparameteriser.utils.STAGE_TIMES_FILE
+        timebin=toolparameteriser.utils.TIME_BIN
+        # fail before running anything, so the job is not recorded as completed without timings
+        lines=[f'[ -x {timebin} ] || {{ echo "GNU time not found at {timebin}" >&2; exit 1; }}\n',
+               f"rm -f {timesfile}\n"]
+        index=0
+        for pipeline in pipelines:
+            wrapped=[]
+            for name,cmd in pipeline:
+                index+=1
+                timed=f'{timebin} -a -o {timesfile} -f "{index},{name},%e,%U,%S,%M" bash -c {shlex.quote(cmd)}'
+                if mode=="srun":
+                    # --overlap lets piped stages share the allocation's CPUs
+                    timed=f"srun --overlap --nodes=1 --ntasks=1 --cpus-per-task=${{cpuspertask}} --job-name={name} {timed}"
+                wrapped.append(timed)
+            lines.append(" | ".join(wrapped)+"\n")
+        logging.debug(f"Wrapped {index} stages with per-stage timing in {mode} mode.")
+        return lines
     
     def _get_tmpl_values(self,parameters:dict,work_dir:str)->dict:
         config=self.Config
@@ -237,8 +312,14 @@ class MQTester(AbstractTester):
             fb.writelines("#SBATCH --export=${environment}\n")
 
             fb.writelines("module load MaxQuant/2.0.2.0\n")
-            fb.writelines("/stornext/System/data/apps/rc-tools/rc-tools-1.0/bin/tools/MQ/createMQXML.py ${threads}\n")
-            fb.writelines("MaxQuant mqpar.mod.xml\n")
+            steps=[("createMQXML","/stornext/System/data/apps/rc-tools/rc-tools-1.0/bin/tools/MQ/createMQXML.py ${threads}"),
+                   ("MaxQuant","MaxQuant mqpar.mod.xml")]
+            if "stages" in self.Config["jobs"]:
+                logging.warning('"stages" is ignored for tool_type="MQ". createMQXML.py and MaxQuant are timed as separate stages instead.')
+            if self._stages_enabled():
+                fb.writelines(self._get_stage_lines(self._get_pipelines(steps)))
+            else:
+                fb.writelines([f"{cmd}\n" for name,cmd in steps])
 
             fb.writelines(
                 'echo \"${jobtype},$SLURM_JOB_ID,${partition},${numfiles},${cpuspertask},${mem},${threads},${timelimit},${qos},${constraints},${workdir},\" >> '+f'{self.jobs_completed_file}\n'
@@ -327,6 +408,8 @@ class DiaNNTester(AbstractTester):
         super()._run_job(runID=runID,parameters=parameters,work_dir=work_dir)
 
     def _create_jobscript_template(self,**kwargs):
+        if any(key in self.Config["jobs"] for key in ("stages","split_stages","stage_mode")):
+            logging.warning('"stages", "split_stages" and "stage_mode" are ignored for tool_type="DiaNN". Only job totals are recorded.')
 
         with open(os.path.join(self.Config["Output_path"],self.tmplfile), "w+") as fb:
             fb.writelines("#!/bin/bash\n")
@@ -351,7 +434,7 @@ class DiaNNTester(AbstractTester):
             fb.writelines(" ${args} \n")
             
             fb.writelines(
-                'echo \"${jobtype},$SLURM_JOB_ID,${partition},${numfiles},${cpuspertask},${mem},${threads},${timelimit},${qos},${constraints},${workingdir},type=${type}\" >> '+f'{self.jobs_completed_file}\n'
+                'echo \"${jobtype},$SLURM_JOB_ID,${partition},${numfiles},${cpuspertask},${mem},${threads},${timelimit},${qos},${constraints},${workdir},type=${type}\" >> '+f'{self.jobs_completed_file}\n'
             )
     """ 
     Method specific to Diann only
@@ -413,17 +496,43 @@ class FromCMDTester(AbstractTester):
             fb.writelines("#SBATCH --export=${environment}\n")
 
             fb.writelines("${modules}\n")
-            if 'cmd' in self.Config["jobs"]:
+            steps=self._get_steps()
+            if self._stages_enabled() and steps:
+                fb.writelines(self._get_stage_lines(self._get_pipelines(steps)))
+            elif 'cmd' in self.Config["jobs"]:
                 fb.writelines(f"{self.Config['jobs']['cmd']}\n")
             
             fb.writelines(
-                'echo \"${jobtype},$SLURM_JOB_ID,${partition},${numfiles},${cpuspertask},${mem},${threads},${timelimit},${qos},${constraints},${workingdir},type=${type}\" >> '+f'{self.jobs_completed_file}\n'
+                'echo \"${jobtype},$SLURM_JOB_ID,${partition},${numfiles},${cpuspertask},${mem},${threads},${timelimit},${qos},${constraints},${workdir},type=${type}\" >> '+f'{self.jobs_completed_file}\n'
             )
         logging.debug(f"Successfully wrote sbatch job templte, {tmplpath}.")
     
     def _run_job(self,runID,parameters,work_dir):
         super()._run_job(runID=runID,parameters=parameters,work_dir=work_dir)
 
+    def _get_steps(self)->list:
+        '''
+        Returns the sequential (name, cmd) steps of the job, taken from the "stages"
+        list if present and not empty, otherwise from "cmd". Stages can be given as
+        commands or as tables with "name" and "cmd" keys.
+        '''
+        if not self.Config["jobs"].get("stages"):
+            if "stages" in self.Config["jobs"]:
+                logging.warning('"stages" is empty. Using "cmd" instead.')
+            if "cmd" not in self.Config["jobs"]:
+                return []
+            return [(None,self.Config["jobs"]["cmd"])]
+        steps=[]
+        for stage in self.Config["jobs"]["stages"]:
+            if isinstance(stage,dict):
+                if "cmd" not in stage:
+                    logging.fatal(f'Stage {stage} in "stages" has no "cmd" key.')
+                    exit()
+                steps.append((stage.get("name"),stage["cmd"]))
+            else:
+                steps.append((None,stage))
+        return steps
+
     def _get_modules(self):
         modules_str=""
         if "modules" in self.Config:
@@ -52,6 +52,35 @@ def clean(dct):
     dct["MemUsed"] = int(dct["MemReq"]) * dct["MemEff"] / 100
     return dct
 
+STAGE_COLUMNS=["Time","CPU Time","CPUs Used","Max RSS"]
+
+def get_stage_times(workingdir) -> dict:
+    '''
+    Reads the per-stage timings written by the job script into the job's working directory.
+    Returns a dict keyed by "<stage> <column>", with times in seconds and Max RSS in GB.
+    '''
+    stages={}
+    if pd.isnull(workingdir):
+        return stages
+    timesfile=os.path.join(workingdir,toolparameteriser.utils.STAGE_TIMES_FILE)
+    if not os.path.exists(timesfile):
+        return stages
+    with open(timesfile,'r') as f:
+        for row in csv.reader(f):
+            # GNU time adds a "Command exited with non-zero status" line for failed stages
+            if len(row)!=6:
+                continue
+            try:
+                name=row[1]
+                elapsed,user,system,maxrss=float(row[2]),float(row[3]),float(row[4]),float(row[5])
+            except ValueError:
+                continue
+            cputime=user+system
+            values=[elapsed,round(cputime,2),round(cputime/elapsed,2) if elapsed>0 else 0,round(maxrss/1024/1024,2)]
+            for col,val in zip(STAGE_COLUMNS,values):
+                stages[f"{name} {col}"]=val
+    return stages
+
 
 def get(completed_jobs:str,results_path,use_GPUs:bool=True,debug:bool=False):
     
@@ -61,7 +90,11 @@ def get(completed_jobs:str,results_path,use_GPUs:bool=True,debug:bool=False):
     Input: jobtype,jobid,partition,numfiles,cpuspertask,mem,threads,timelimit,constraints,workingdir,extra
     Output: JobId,JobType,NumFiles,Threads,Extra,Nodes,CPUs Requested,CPUs Used,CPUs Efficiency,Memory Requested,
             Memory Used,Memory Efficiency,GPUs Used,Time,WorkingDir,Cluster,Constraints
+            followed by "<stage> Time","<stage> CPU Time","<stage> CPUs Used","<stage> Max RSS" for each timed stage
     '''
+    header=["JobId", "JobType","NumFiles","Threads","Extra","Nodes", "CPUs Requested","CPUs Used","CPUs Efficiency","Memory Requested","Memory Used", "Memory Efficiency","GPUs Used","Time","WorkingDir","Cluster","Constraints"]
+    allstages=[]
+    stage_columns=[]
 
     jobs=pd.read_csv(completed_jobs,index_col=False)
     #Get job ids
@@ -97,16 +130,35 @@ def get(completed_jobs:str,results_path,use_GPUs:bool=True,debug:bool=False):
                 allresults.append([executed_job["jobid"],executed_job["jobtype"],executed_job['numfiles'],executed_job["threads"],executed_job["extra"], 
                                     dct["Nodes"],dct["CPUsReq"],dct["CPUsUsed"],dct["CPUEff"],dct["MemReq"],dct["MemUsed"],dct["MemEff"],dct["GPUs"],
                                     dct["time(s)"],executed_job['workingdir'],dct['Cluster'],executed_job['constraints']])
+                stages=get_stage_times(executed_job['workingdir'])
+                allstages.append(stages)
+                stage_columns+=[col for col in stages if col not in stage_columns]
             else:
                 logging.error(f"Job {executed_job['jobid']} is still running or has failed.")
                 failed.append([executed_job["jobid"],executed_job["jobtype"],dct["State"],executed_job['numfiles'],executed_job["threads"],dct["time(s)"],executed_job["extra"],
                                 executed_job['workingdir'],dct['Cluster'],executed_job['constraints']])
         else:
             logging.error(f"seff failed for job {executed_job['jobid']}")
+    if os.path.exists(results_path):
+        # appended rows must follow the stage columns already in the results file
+        with open(results_path,'r') as f:
+            rows=list(csv.reader(f))
+        existing_columns=rows[0][len(header):] if rows else []
+        new_columns=[col for col in stage_columns if col not in existing_columns]
+        stage_columns=existing_columns+new_columns
+        if new_columns or not rows:
+            # rewrite the existing results with the combined header, leaving new columns empty
+            logging.info(f"Adding stage columns {new_columns} to existing results file {results_path}.")
+            width=len(header)+len(stage_columns)
+            with open(results_path,'w') as f:
+                writer = csv.writer(f)
+                writer.writerow(header+stage_columns)
+                writer.writerows([row+[""]*(width-len(row)) for row in rows[1:]])
+    allresults=[result+[stages.get(col,"") for col in stage_columns] for result,stages in zip(allresults,allstages)]
     if not os.path.exists(results_path):
             with open(results_path,'w') as f:
                 writer = csv.writer(f)
-                writer.writerow(["JobId", "JobType","NumFiles","Threads","Extra","Nodes", "CPUs Requested","CPUs Used","CPUs Efficiency","Memory Requested","Memory Used", "Memory Efficiency","GPUs Used","Time","WorkingDir","Cluster","Constraints"])
+                writer.writerow(header+stage_columns)
                 writer.writerows(allresults)
     else:
         with open(results_path,'a') as f:
@@ -21,3 +21,79 @@ def setlogging(debug=False):
     logging.basicConfig(level=level, 
                         format='[%(asctime)s] {%(filename)s:%(lineno)d} %(levelname)s - %(message)s',
                         handlers=[file_handler,stdout_handler])
+
+# File, relative to each job's working directory, that per-stage timings are appended to
+STAGE_TIMES_FILE="stage_times.csv"
+# GNU time is used (rather than the bash keyword) as it can also report peak RSS
+TIME_BIN="/usr/bin/time"
+
+# Words that start compound commands, which cannot be split into separately timed stages
+SHELL_KEYWORDS={"for","while","until","if","then","else","elif","fi","case","esac","do","done","select","function"}
+
+def split_pipeline(cmd:str) -> list:
+    '''
+    Splits a shell command on its pipes, if it is a plain pipeline of simple commands.
+    Pipes inside quotes, parentheses or ${} are left untouched, as are "|&" pipes.
+    Commands containing an unquoted ";", "&", "&&", "||", newline, backtick, comment,
+    {} group or a compound command keyword are returned as a single stage.
+    '''
+    stages=[]
+    current=""
+    quote=None
+    depth=0
+    braces=0
+    simple=True
+    i=0
+    while i < len(cmd):
+        c=cmd[i]
+        if c=="\\" and quote!="'" and i+1 < len(cmd):
+            current+=cmd[i:i+2]
+            i+=2
+            continue
+        if quote:
+            if c==quote:
+                quote=None
+        elif c in "'\"":
+            quote=c
+        elif c=="$" and cmd[i+1:i+2]=="{":
+            braces+=1
+            current+="${"
+            i+=2
+            continue
+        elif c=="}" and braces>0:
+            braces-=1
+        elif c=="(":
+            depth+=1
+        elif c==")" and depth>0:
+            depth-=1
+        elif depth==0 and braces==0:
+            if c in ";\n`{}" or cmd[i:i+2] in ("&&","||"):
+                simple=False
+                break
+            # a "#" starting a word begins a comment
+            if c=="#" and (i==0 or cmd[i-1] in " \t|"):
+                simple=False
+                break
+            # a lone "&" backgrounds a command, unlike the redirections ">&" and "&>"
+            if c=="&" and cmd[i-1:i]!=">" and cmd[i+1:i+2]!=">":
+                simple=False
+                break
+            if c=="|":
+                if cmd[i+1:i+2]=="&":
+                    current+="|&"
+                    i+=2
+                    continue
+                stages.append(current.strip())
+                current=""
+                i+=1
+                continue
+        current+=c
+        i+=1
+    stages.append(current.strip())
+    stages=[stage for stage in stages if stage]
+    if simple and any(stage.split()[0] in SHELL_KEYWORDS for stage in stages):
+        simple=False
+    if not simple:
+        logging.warning(f"Command is not a plain pipeline, not splitting it into stages: {cmd}")
+        return [cmd.strip()]
+    return stages